@@ -0,0 +1,325 @@
+import io
+import os
+import re
+import json
+import zipfile
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, quote, urlencode
+
+import pandas as pd
+
+from config import SURVEY_PERIODS, report_filenames, grade_report_filename
+from data_processor import preprocess_data
+from report_1_generator import generate_report_one, load_parsed_template
+from radar_chart_generator import generate_radar_chart
+from trend_graph_generator import generate_trend_graph
+from grade_reports_generator import generate_grade_reports
+
+# --- Constants ---
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MIME = "application/zip"
+REPORT_KINDS = ["one", "radar", "trend", "grades", "bundle"]
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+# Bodies of rejected requests up to this size are read and dropped so the
+# client sees the error response; anything larger just closes the connection
+MAX_DISCARD_BYTES = 4 * MAX_UPLOAD_BYTES
+DISCARD_CHUNK_BYTES = 64 * 1024
+
+
+class UploadError(Exception):
+    """The uploaded body could not be read as a survey workbook."""
+
+
+# --- Report building (runs inside the worker processes) ---
+def build_artifacts(df_processed, kind, survey_period):
+    """Generates the requested reports and returns a dict of filename -> bytes."""
+    names = report_filenames(survey_period)
+    files = {}
+    if kind in ("one", "bundle"):
+        files[names["one"]] = generate_report_one(df_processed, survey_period).getvalue()
+    if kind in ("radar", "bundle"):
+        files[names["radar"]] = generate_radar_chart(df_processed).getvalue()
+    if kind in ("trend", "bundle"):
+        files[names["trend"]] = generate_trend_graph(df_processed).getvalue()
+    if kind in ("grades", "bundle"):
+        for name, report_bytes in generate_grade_reports(df_processed, survey_period).items():
+            files[grade_report_filename(survey_period, name)] = report_bytes.getvalue()
+    return files
+
+
+def zip_artifacts(files):
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for filename, data in files.items():
+            zf.writestr(filename, data)
+    return output.getvalue()
+
+
+def _init_worker():
+    """Warms up a freshly forked worker so the first request does not pay for it."""
+    try:
+        load_parsed_template()
+    except FileNotFoundError:
+        # The その１ template is optional for the other report kinds
+        pass
+
+
+def run_report_job(kind, upload_bytes, survey_period):
+    """
+    Worker entry point: parses the uploaded workbook and returns
+    (content_type, filename, body) for the requested report kind.
+    """
+    try:
+        df_raw = pd.read_excel(io.BytesIO(upload_bytes))
+    except Exception as e:
+        raise UploadError(f"アップロードされたファイルを読み込めません: {e}") from e
+    df_processed = preprocess_data(df_raw)
+    files = build_artifacts(df_processed, kind, survey_period)
+
+    if kind in ("one", "radar", "trend"):
+        filename, body = next(iter(files.items()))
+        return XLSX_MIME, filename, body
+    return ZIP_MIME, report_filenames(survey_period)[kind], zip_artifacts(files)
+
+
+def _ping():
+    return os.getpid()
+
+
+# --- HTTP layer ---
+class ReportHTTPServer(ThreadingHTTPServer):
+    """
+    Threaded front end that hands report jobs to a preforked process pool.
+    At most `workers + queue_size` jobs are admitted at once; any request
+    beyond that is rejected immediately with 503 so clients can back off.
+    """
+    daemon_threads = True
+
+    def __init__(self, server_address, workers, queue_size, job_timeout):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.job_timeout = job_timeout
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.executor_lock = threading.Lock()
+        self.executor = self._start_executor()
+        try:
+            super().__init__(server_address, ReportRequestHandler)
+        except BaseException:
+            # e.g. the port is already in use: do not leave the workers running
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    def _start_executor(self):
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        # Workers are started on demand; submit one task per worker so they all start (preforked) now
+        wait([executor.submit(_ping) for _ in range(self.workers)])
+        return executor
+
+    def submit_job(self, kind, upload_bytes, survey_period):
+        """
+        Runs a report job in the pool. The caller's slot is released when the
+        job finishes, fails, or its worker dies, not when the request gives up.
+        """
+        with self.executor_lock:
+            try:
+                future = self.executor.submit(run_report_job, kind, upload_bytes, survey_period)
+            except BrokenProcessPool:
+                # A worker died (OOM kill, segfault...): replace the whole pool
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._start_executor()
+                future = self.executor.submit(run_report_job, kind, upload_bytes, survey_period)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections are closed after this many seconds
+    timeout = 30
+    # Request admitted in handle_expect_100, as (kind, survey_period, length)
+    admitted = None
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._send_json(200, {"status": "ok", "workers": self.server.workers,
+                                  "queue_size": self.server.queue_size,
+                                  "reports": REPORT_KINDS, "survey_periods": SURVEY_PERIODS})
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def handle_expect_100(self):
+        """
+        Clients that send `Expect: 100-continue` (curl does for large uploads)
+        are rejected before they transmit the body; only admitted requests
+        get the 100 Continue.
+        """
+        if self.command != "POST":
+            return super().handle_expect_100()
+        request = self._check_request(body_sent=False)
+        if request is None:
+            return False
+        if not self.server.slots.acquire(blocking=False):
+            self._reject_busy(request[2], body_sent=False)
+            return False
+        self.admitted = request
+        return super().handle_expect_100()
+
+    def do_POST(self):
+        request, self.admitted = self.admitted, None
+        if request is None:
+            request = self._check_request(body_sent=True)
+            if request is None:
+                return
+            # Backpressure: reject instead of queueing without bound
+            if not self.server.slots.acquire(blocking=False):
+                self._reject_busy(request[2], body_sent=True)
+                return
+        kind, survey_period, length = request
+
+        try:
+            upload_bytes = self.rfile.read(length)
+            future = self.server.submit_job(kind, upload_bytes, survey_period)
+        except BaseException:
+            self.server.slots.release()
+            raise
+        try:
+            content_type, filename, body = future.result(timeout=self.server.job_timeout)
+        except FutureTimeoutError:
+            self._send_json(504, {"error": "Report generation timed out"})
+            return
+        except UploadError as e:
+            self._send_json(422, {"error": str(e)})
+            return
+        except BrokenProcessPool:
+            self._send_json(500, {"error": "レポート生成プロセスが異常終了しました"})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"エラーが発生しました: {e}"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Disposition",
+                         f"attachment; filename=\"{kind}{os.path.splitext(filename)[1]}\"; "
+                         f"filename*=UTF-8''{quote(filename)}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _check_request(self, body_sent):
+        """
+        Validates the report request line and headers. Returns
+        (kind, survey_period, length), or None after sending an error response.
+        """
+        length = self._content_length()
+        if length is None:
+            return None
+
+        url = urlparse(self.path)
+        match = re.fullmatch(r'/reports/(\w+)', url.path)
+        survey_period = parse_qs(url.query).get("survey_period", [""])[0]
+        if not match or match.group(1) not in REPORT_KINDS:
+            status, error = 404, f"Unknown report. Use /reports/<{'|'.join(REPORT_KINDS)}>"
+        elif survey_period not in SURVEY_PERIODS:
+            status, error = 400, f"survey_period must be one of {SURVEY_PERIODS}"
+        elif length == 0:
+            status, error = 400, "Request body must be the survey .xlsx file"
+        elif length > MAX_UPLOAD_BYTES:
+            status, error = 413, f"Upload exceeds {MAX_UPLOAD_BYTES} bytes"
+        else:
+            return match.group(1), survey_period, length
+
+        self._skip_body(length, body_sent)
+        self._send_json(status, {"error": error})
+        return None
+
+    def _reject_busy(self, length, body_sent):
+        self._skip_body(length, body_sent)
+        self._send_json(503, {"error": "Server busy, retry later"}, {"Retry-After": "1"})
+
+    def _content_length(self):
+        """Returns the parsed Content-Length, or None after sending an error response."""
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.close_connection = True
+            self._send_json(411, {"error": "Content-Length is required"})
+            return None
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._send_json(400, {"error": "Content-Length must be a non-negative integer"})
+            return None
+        return length
+
+    def _skip_body(self, length, body_sent):
+        """
+        Drops the body of a rejected request in small chunks, so the client can
+        finish sending and read the response without the server buffering it.
+        """
+        if not body_sent or length > MAX_DISCARD_BYTES:
+            self.close_connection = True
+            return
+        while length > 0:
+            chunk = self.rfile.read(min(length, DISCARD_CHUNK_BYTES))
+            if not chunk:
+                break
+            length -= len(chunk)
+
+    def _send_json(self, status, payload, extra_headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# --- Local client ---
+def request_report(conn, kind, upload_bytes, survey_period):
+    """
+    Posts an upload to a running server over an existing http.client connection
+    (which is reused across calls thanks to keep-alive).
+    Returns (status, headers, body).
+    """
+    conn.request("POST", f"/reports/{kind}?{urlencode({'survey_period': survey_period})}",
+                 body=upload_bytes, headers={"Content-Type": XLSX_MIME})
+    response = conn.getresponse()
+    return response.status, dict(response.getheaders()), response.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RGB意識調査 レポート生成 HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per report job")
+    args = parser.parse_args()
+
+    server = ReportHTTPServer((args.host, args.port), args.workers, args.queue_size, args.timeout)
+    print(f"--- [API] Serving on http://{args.host}:{args.port} "
+          f"({args.workers} workers, queue {args.queue_size}) ---")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
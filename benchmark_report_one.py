@@ -0,0 +1,61 @@
+import time
+import random
+import argparse
+import tracemalloc
+import pandas as pd
+from config import ALL_QUESTIONS, SCORE_MAP
+from data_processor import preprocess_data
+from report_1_generator import generate_report_one, load_parsed_template
+
+# Compares the two その１ output paths of generate_report_one:
+#   xml      - patches the template's sheet XML directly
+#   openpyxl - loads and re-saves the whole workbook
+# Run from the repository root so the template/ directory is found.
+
+
+def make_survey(n_students, seed=0):
+    random.seed(seed)
+    id_col = "あなたのクラスと出席番号を4桁の数字で入力してください　例）1年6組34番 ⇒ 1634"
+    answers = list(SCORE_MAP)
+    rows = []
+    for _ in range(n_students):
+        row = {id_col: f"{random.randint(1, 3)}{random.randint(1, 8)}{random.randint(1, 40):02d}"}
+        for q in ALL_QUESTIONS:
+            row[q] = random.choice(answers)
+        rows.append(row)
+    return preprocess_data(pd.DataFrame(rows))
+
+
+def measure(df_processed, survey_period, engine, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        generate_report_one(df_processed, survey_period, engine=engine)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    generate_report_one(df_processed, survey_period, engine=engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), sorted(timings)[len(timings) // 2], peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the その１ report output paths")
+    parser.add_argument("--students", type=int, default=800)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--survey-period", default="9月(第二回)")
+    args = parser.parse_args()
+
+    df_processed = make_survey(args.students)
+    load_parsed_template()  # Both engines share the cached template bytes
+
+    print(f"students={args.students} repeat={args.repeat} survey_period={args.survey_period}")
+    print(f"{'engine':<10}{'best (ms)':>12}{'median (ms)':>14}{'peak mem (KiB)':>17}")
+    for engine in ["xml", "openpyxl"]:
+        best, median, peak = measure(df_processed, args.survey_period, engine, args.repeat)
+        print(f"{engine:<10}{best * 1000:>12.1f}{median * 1000:>14.1f}{peak / 1024:>17.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import re
+
 
 # config.py
 
@@ -45,6 +47,29 @@ COMPETENCY_MAP = [
     ])
 ]
 
+# 調査時期の選択肢
+SURVEY_PERIODS = ["4月(第一回)", "9月(第二回)", "1月(第三回)"]
+
+# 出力ファイル名
+def survey_month(survey_period):
+    """Extracts the month like "9月" from "9月(第二回)"."""
+    month_match = re.match(r'(\d+月)', survey_period)
+    return month_match.group(1) if month_match else "UnknownMonth"
+
+def report_filenames(survey_period):
+    """Download filenames for each report, shared by the Streamlit app and the API server."""
+    month_str = survey_month(survey_period)
+    return {
+        "one": "【その１データ】 RGB意識調査の質問項目と表(職員会議用）.xlsx",
+        "radar": "【その２データ】RGBレーダーチャート（R7職員会議資料用）.xlsx",
+        "trend": "【その３データ】【R3～R7】RGB推移グラフ（R7職員会議用）.xlsx",
+        "grades": f"1.RGB意識調査R7.{month_str}結果（学年別・分布あり）.zip",
+        "bundle": f"RGB意識調査R7.{month_str}レポート一式.zip",
+    }
+
+def grade_report_filename(survey_period, grade_name):
+    return f"1.RGB意識調査R7.{survey_month(survey_period)}結果（{grade_name}・分布あり）.xlsx"
+
 # 回答文言の数値変換
 SCORE_MAP = {
     "とてもそう思う": 4, "そう思う": 4,
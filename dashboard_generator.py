@@ -0,0 +1,136 @@
+import pandas as pd
+import plotly.graph_objects as go
+from config import COMPETENCY_MAP, ALL_QUESTIONS, HISTORICAL_BENCHMARKS
+
+# --- Constants ---
+COMPETENCIES_FOR_CHART = [comp for _, comp, _ in COMPETENCY_MAP]
+QUESTION_TO_COMPETENCY = {q: comp for _, comp, qs in COMPETENCY_MAP for q in qs}
+SCORES = [4, 3, 2, 1]
+SCORE_LABELS = {4: "とてもそう思う", 3: "どちらかといえばそう思う", 2: "どちらかといえばそう思わない", 1: "そう思わない"}
+SCORE_COLORS = {4: '#4F81BD', 3: '#9DC3E6', 2: '#F4B183', 1: '#C0504D'}
+GRADE_COLORS = {1: '#4F81BD', 2: '#C0504D', 3: '#9ABA60'}
+
+
+# --- Aggregation (run once per upload) ---
+def compute_aggregates(df_processed):
+    """
+    Collapses the processed survey data into answer counts per
+    (学年, クラス, 質問, score). Every dashboard view is derived from this
+    small table, so filters never need to go back to the raw DataFrame.
+    Returns a DataFrame with columns 学年, クラス, question, 4, 3, 2, 1,
+    where クラス includes the grade (e.g. "1年3組") so classes of different
+    grades are never merged.
+    """
+    questions = [q for q in ALL_QUESTIONS if q in df_processed.columns]
+    grades = df_processed['学年'] if '学年' in df_processed.columns else pd.Series(pd.NA, index=df_processed.index)
+    if 'クラス' in df_processed.columns:
+        classes = grades.astype('string') + '年' + df_processed['クラス'].astype('string')
+    else:
+        classes = pd.NA
+    df = pd.DataFrame({'学年': grades, 'クラス': classes}, index=df_processed.index)
+    df = pd.concat([df, df_processed[questions]], axis=1)
+
+    long_df = df.melt(id_vars=['学年', 'クラス'], var_name='question', value_name='score')
+    long_df = long_df.dropna(subset=['score'])
+    long_df['score'] = long_df['score'].astype(int)
+
+    counts = (long_df.groupby(['学年', 'クラス', 'question', 'score'], dropna=False).size()
+              .unstack('score', fill_value=0)
+              .reindex(columns=SCORES, fill_value=0)
+              .reset_index())
+    counts.columns.name = None
+    return counts
+
+
+def filter_counts(counts, grades=None, classes=None, questions=None):
+    """Sums the cached counts over the selected grades/classes, one row per question."""
+    mask = pd.Series(True, index=counts.index)
+    if grades is not None:
+        mask &= counts['学年'].isin(grades)
+    if classes is not None:
+        mask &= counts['クラス'].isin(classes)
+    if questions is not None:
+        mask &= counts['question'].isin(questions)
+    summed = counts[mask].groupby('question')[SCORES].sum()
+    return summed.reindex([q for q in ALL_QUESTIONS if q in summed.index])
+
+
+def question_averages(q_counts):
+    totals = q_counts[SCORES].sum(axis=1)
+    weighted = sum(q_counts[s] * s for s in SCORES)
+    return (weighted / totals.where(totals > 0)).rename('average')
+
+
+def competency_averages(q_counts):
+    """Mean of the question averages per competency, as in the Excel reports."""
+    q_avg = question_averages(q_counts).dropna()
+    comp_avg = q_avg.groupby(q_avg.index.map(QUESTION_TO_COMPETENCY)).mean()
+    return {comp: comp_avg.get(comp) for comp in COMPETENCIES_FOR_CHART}
+
+
+# --- Figures ---
+def create_radar_figure(series):
+    """series: dict of trace name -> (competency averages dict, color)."""
+    fig = go.Figure()
+    categories = COMPETENCIES_FOR_CHART + COMPETENCIES_FOR_CHART[:1]  # Close the polygon
+    for name, (averages, color) in series.items():
+        values = [averages.get(c) for c in categories]
+        fig.add_trace(go.Scatterpolar(r=values, theta=categories, name=name,
+                                      line={'color': color}, connectgaps=True))
+    fig.update_layout(polar={'radialaxis': {'range': [1, 4]}},
+                      title='RGB Competency Radar Chart', legend={'orientation': 'h'})
+    return fig
+
+
+def create_trend_figure(current_averages):
+    fig = go.Figure()
+    colors = ['#4F81BD', '#C0504D', '#9ABA60', '#F79646']
+    for i, year in enumerate(["R4", "R5", "R6"]):
+        fig.add_trace(go.Scatter(
+            x=COMPETENCIES_FOR_CHART,
+            y=[HISTORICAL_BENCHMARKS[comp].get(year) for comp in COMPETENCIES_FOR_CHART],
+            name=year, mode='lines+markers', line={'color': colors[i]}))
+    fig.add_trace(go.Scatter(
+        x=COMPETENCIES_FOR_CHART,
+        y=[current_averages.get(comp) for comp in COMPETENCIES_FOR_CHART],
+        name="R7", mode='lines+markers', line={'color': colors[3], 'width': 3}))
+    fig.update_layout(title='RGB Competency Trends (R4-R7)', yaxis={'range': [1, 4], 'title': 'Average Score'},
+                      legend={'orientation': 'h'})
+    return fig
+
+
+def create_distribution_figure(q_counts):
+    totals = q_counts[SCORES].sum(axis=1)
+    percentages = q_counts[SCORES].div(totals.where(totals > 0), axis=0).fillna(0) * 100
+    labels = [f"{i + 1}. {q[:30]}…" if len(q) > 30 else f"{i + 1}. {q}" for i, q in enumerate(percentages.index)]
+
+    fig = go.Figure()
+    for s in SCORES:
+        fig.add_trace(go.Bar(y=labels, x=percentages[s], name=SCORE_LABELS[s], orientation='h',
+                             marker={'color': SCORE_COLORS[s]}, customdata=percentages.index,
+                             hovertemplate='%{customdata}<br>%{x:.1f}%<extra>' + SCORE_LABELS[s] + '</extra>'))
+    fig.update_layout(barmode='stack', title='回答分布', xaxis={'range': [0, 100], 'title': '%'},
+                      yaxis={'autorange': 'reversed'}, legend={'orientation': 'h'},
+                      height=max(300, 28 * len(labels) + 150))
+    return fig
+
+
+def create_dashboard_figures(counts, grades=None, classes=None, questions=None):
+    """
+    Builds the radar, trend and distribution figures for the selected filters.
+    A filter of None means "no filter" (rows with an unknown grade/class are kept).
+    """
+    q_counts = filter_counts(counts, grades, classes, questions)
+
+    radar_series = {"選択範囲": (competency_averages(q_counts), '#7F7F7F')}
+    # Overlay each grade when comparing several of them (all grades when unfiltered)
+    compare_grades = grades if grades is not None else sorted(int(g) for g in counts['学年'].dropna().unique())
+    for grade in (compare_grades if len(compare_grades) > 1 else []):
+        grade_counts = filter_counts(counts, [grade], classes, questions)
+        radar_series[f"{grade}年"] = (competency_averages(grade_counts), GRADE_COLORS.get(grade, '#7F7F7F'))
+
+    return {
+        'radar': create_radar_figure(radar_series),
+        'trend': create_trend_figure(competency_averages(q_counts)),
+        'distribution': create_distribution_figure(q_counts),
+    }
@@ -3,9 +3,14 @@ import pandas as pd
 import numpy as np
 import io
 import re
+import os
+import functools
 import openpyxl
 from openpyxl.utils import get_column_letter
 from config import COMPETENCY_MAP
+from xlsx_patcher import parse_template, patch_workbook
+
+TEMPLATE_PATH = os.path.join('template', '【その１データ】 RGB意識調査の質問項目と表(職員会議用）.xlsx')
 
 print("--- [IMPORT] Loading latest report_one_generator.py ---")
 
@@ -18,11 +23,35 @@ def normalize_text(text):
     text = re.sub(r'[.,。、？！ー・]', '', text) # Remove common punctuation
     return text.lower()
 
+# --- Template cache ---
+# Long-lived processes (the Streamlit app, the API server workers) reuse the
+# template between reports. The file's mtime is part of the cache key, so a
+# replaced template is picked up without restarting.
+def load_template_bytes(template_path=TEMPLATE_PATH):
+    return _read_template_bytes(template_path, os.path.getmtime(template_path))
+
+@functools.lru_cache(maxsize=4)
+def _read_template_bytes(template_path, mtime):
+    with open(template_path, 'rb') as f:
+        return f.read()
+
+def load_parsed_template(template_path=TEMPLATE_PATH):
+    return _parse_template(template_path, os.path.getmtime(template_path))
+
+@functools.lru_cache(maxsize=4)
+def _parse_template(template_path, mtime):
+    return parse_template(_read_template_bytes(template_path, mtime))
+
 # --- Main Generator Function ---
 # This function is designed to be flexible for different survey periods.
-def generate_report_one(df_processed, survey_period):
-    import os
-    template_path = os.path.join('template', '【その１データ】 RGB意識調査の質問項目と表(職員会議用）.xlsx')
+def generate_report_one(df_processed, survey_period, engine='xml'):
+    """
+    Fills the その１ template with per-grade averages for the survey period.
+    engine='xml' patches the sheet XML directly (fast path);
+    engine='openpyxl' loads and re-saves the whole workbook.
+    """
+    if engine not in ('xml', 'openpyxl'):
+        raise ValueError(f"Unknown engine '{engine}'. Use 'xml' or 'openpyxl'.")
 
     # Mapping for survey rounds to specific columns in the template
     # Key: Round name (e.g., "第二回"), Value: Dict of grade to column number
@@ -50,88 +79,27 @@ def generate_report_one(df_processed, survey_period):
     # Get the column mapping for the current round, or default to second round if not found
     col_map = COLUMN_MAPPING.get(round_name, COLUMN_MAPPING["第二回"])
 
-    # Load the template
-    wb = openpyxl.load_workbook(template_path)
+    if engine == 'openpyxl':
+        wb = openpyxl.load_workbook(io.BytesIO(load_template_bytes()))
+        ws = wb.active
+        read_cell = lambda ref: ws[ref].value
+        max_row = ws.max_row
+    else:
+        template = load_parsed_template()
+        read_cell = template.cells.get
+        max_row = template.max_row
 
     # Only perform grade-based calculations if the '学年' column exists
+    values = {}
     if '学年' in df_processed.columns:
-        ws = wb['意識調査']
-
-        # Calculate averages from the user's data
-        q_averages = {}
-        for grade in [1, 2, 3]:
-            df_grade = df_processed[df_processed['学年'] == grade]
-            q_averages[grade] = {q: df_grade[q].mean() for _, _, qs in COMPETENCY_MAP for q in qs if q in df_grade}
-
-        comp_averages = {}
-        for grade in [1, 2, 3]:
-            df_grade = df_processed[df_processed['学年'] == grade]
-            comp_averages[grade] = {}
-            for _, competency, questions in COMPETENCY_MAP:
-                valid_qs = [q for q in questions if q in df_processed.columns and not df_processed[q].isnull().all()]
-                if valid_qs:
-                    avg = df_grade[valid_qs].mean().mean()
-                    if pd.isna(avg):
-                        avg = 0
-                    comp_averages[grade][competency] = avg
-
-        # Pre-compute normalized question map for faster lookup
-        # Key: Normalized Text, Value: Original Text
-        question_map = {}
-        for comp in COMPETENCY_MAP:
-            for q in comp[2]:
-                normalized_q = normalize_text(q)
-                question_map[normalized_q] = q
-
-        # Load the template
-        wb = openpyxl.load_workbook(template_path)
-        ws = wb.active
+        values = calculate_cell_values(df_processed, col_map, read_cell, max_row)
 
-        # Iterate through the sheet to find questions and update values
-        for row in range(2, ws.max_row + 1):
-            # Get question text from the template (Column C)
-            cell_val = ws[f'C{row}'].value
-            if cell_val:
-                # Normalize template question
-                q_text = normalize_text(cell_val)
-                
-                # Find matching question in our data map
-                original_q_text = question_map.get(q_text)
-                if original_q_text:
-                    # Calculate averages per grade
-                    avg1 = q_averages.get(1, {}).get(original_q_text, 0)
-                    avg2 = q_averages.get(2, {}).get(original_q_text, 0)
-                    avg3 = q_averages.get(3, {}).get(original_q_text, 0)
-                    
-                    ws.cell(row=row, column=col_map[1]).value = avg1 if not pd.isna(avg1) else 0
-                    ws.cell(row=row, column=col_map[2]).value = avg2 if not pd.isna(avg2) else 0
-                    ws.cell(row=row, column=col_map[3]).value = avg3 if not pd.isna(avg3) else 0
-                    
-                    # Apply number format
-                    for col_idx in col_map.values():
-                        if ws.cell(row=row, column=col_idx).value is not None:
-                            ws.cell(row=row, column=col_idx).number_format = '0.0'
-
-        # Update the overall competency averages on the right
-        # Columns AF/32 (1年), AG/33 (2年), AH/34 (3年)
-        for row in range(3, 3 + len(COMPETENCY_MAP)):
-            competency_cell = ws[f'AE{row}']
-            if competency_cell.value:
-                competency_name_in_cell = competency_cell.value.split('(')[0].strip()
-                
-                for group_name, competency_name, questions in COMPETENCY_MAP:
-                    if competency_name_in_cell == competency_name:
-                        avg1 = comp_averages.get(1, {}).get(competency_name, 0)
-                        avg2 = comp_averages.get(2, {}).get(competency_name, 0)
-                        avg3 = comp_averages.get(3, {}).get(competency_name, 0)
-
-                        ws.cell(row=row, column=32).value = avg1 if not pd.isna(avg1) else 0
-                        ws.cell(row=row, column=33).value = avg2 if not pd.isna(avg2) else 0
-                        ws.cell(row=row, column=34).value = avg3 if not pd.isna(avg3) else 0
-                        
-                        for col_idx in [32, 33, 34]:
-                             if ws.cell(row=row, column=col_idx).value is not None:
-                                ws.cell(row=row, column=col_idx).number_format = '0.0'
+    if engine == 'xml':
+        return patch_workbook(template, values, '0.0')
+
+    for (row, col), value in values.items():
+        ws.cell(row=row, column=col).value = value
+        ws.cell(row=row, column=col).number_format = '0.0'
 
     # Save to a new in-memory file
     output = io.BytesIO()
@@ -139,3 +107,66 @@ def generate_report_one(df_processed, survey_period):
     output.seek(0)
     return output
 
+
+def calculate_cell_values(df_processed, col_map, read_cell, max_row):
+    """
+    Returns {(row, column): value} for the template cells to update.
+    `read_cell` looks up a template cell's value by reference (e.g. 'C5').
+    """
+    # Calculate averages from the user's data
+    q_averages = {}
+    for grade in [1, 2, 3]:
+        df_grade = df_processed[df_processed['学年'] == grade]
+        q_averages[grade] = {q: df_grade[q].mean() for _, _, qs in COMPETENCY_MAP for q in qs if q in df_grade}
+
+    comp_averages = {}
+    for grade in [1, 2, 3]:
+        df_grade = df_processed[df_processed['学年'] == grade]
+        comp_averages[grade] = {}
+        for _, competency, questions in COMPETENCY_MAP:
+            valid_qs = [q for q in questions if q in df_processed.columns and not df_processed[q].isnull().all()]
+            if valid_qs:
+                avg = df_grade[valid_qs].mean().mean()
+                if pd.isna(avg):
+                    avg = 0
+                comp_averages[grade][competency] = avg
+
+    # Pre-compute normalized question map for faster lookup
+    # Key: Normalized Text, Value: Original Text
+    question_map = {}
+    for comp in COMPETENCY_MAP:
+        for q in comp[2]:
+            normalized_q = normalize_text(q)
+            question_map[normalized_q] = q
+
+    values = {}
+    # Iterate through the sheet to find questions and update values
+    for row in range(2, max_row + 1):
+        # Get question text from the template (Column C)
+        cell_val = read_cell(f'C{row}')
+        if cell_val:
+            # Normalize template question
+            q_text = normalize_text(cell_val)
+            
+            # Find matching question in our data map
+            original_q_text = question_map.get(q_text)
+            if original_q_text:
+                # Calculate averages per grade
+                for grade in [1, 2, 3]:
+                    avg = q_averages.get(grade, {}).get(original_q_text, 0)
+                    values[(row, col_map[grade])] = avg if not pd.isna(avg) else 0
+
+    # Update the overall competency averages on the right
+    # Columns AF/32 (1年), AG/33 (2年), AH/34 (3年)
+    for row in range(3, 3 + len(COMPETENCY_MAP)):
+        competency_value = read_cell(f'AE{row}')
+        if competency_value:
+            competency_name_in_cell = competency_value.split('(')[0].strip()
+            
+            for group_name, competency_name, questions in COMPETENCY_MAP:
+                if competency_name_in_cell == competency_name:
+                    for grade, col_idx in zip([1, 2, 3], [32, 33, 34]):
+                        avg = comp_averages.get(grade, {}).get(competency_name, 0)
+                        values[(row, col_idx)] = avg if not pd.isna(avg) else 0
+
+    return values
@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 import io
-import re
 
 print("--- [EXECUTION] Running latest streamlit_app.py ---")
 
@@ -11,6 +10,8 @@ from report_1_generator import generate_report_one
 from radar_chart_generator import generate_radar_chart
 from trend_graph_generator import generate_trend_graph
 from grade_reports_generator import generate_grade_reports
+from dashboard_generator import compute_aggregates, create_dashboard_figures
+from config import SURVEY_PERIODS, ALL_QUESTIONS, report_filenames, grade_report_filename
 
 st.set_page_config(layout="wide")
 
@@ -21,7 +22,7 @@ st.sidebar.header("設定")
 uploaded_file = st.sidebar.file_uploader("① アンケート結果Excelをアップロード", type=["xlsx"])
 current_survey = st.sidebar.selectbox(
     "② 調査時期を選択",
-    ["4月(第一回)", "9月(第二回)", "1月(第三回)"],
+    SURVEY_PERIODS,
     index=1  # Default to 9月(第二回)
 )
 
@@ -35,13 +36,54 @@ else:
             with st.spinner("ファイルを読み込み、前処理を実行中..."):
                 df_raw = pd.read_excel(uploaded_file)
                 st.session_state['df_processed'] = preprocess_data(df_raw.copy())
+                # The preview aggregates are rebuilt once for the new file
+                st.session_state.pop('dashboard_counts', None)
                 st.session_state['uploaded_filename'] = uploaded_file.name
                 # Clear old reports when a new file is uploaded
                 st.session_state['reports_generated'] = False
                 st.success("ファイルの準備が完了しました。")
         
         df_processed = st.session_state['df_processed']
-        
+
+        st.header("結果プレビュー")
+        # The preview is independent of report generation: a failure here must not block the reports below
+        try:
+            # Aggregate once per upload; filter changes only read these counts
+            if 'dashboard_counts' not in st.session_state:
+                st.session_state['dashboard_counts'] = compute_aggregates(df_processed)
+            counts = st.session_state['dashboard_counts']
+            grade_options = sorted(int(g) for g in counts['学年'].dropna().unique())
+            question_options = [q for q in ALL_QUESTIONS if q in set(counts['question'])]
+
+            filter_col1, filter_col2, filter_col3 = st.columns(3)
+            with filter_col1:
+                selected_grades = st.multiselect("学年", grade_options, default=grade_options,
+                                                 format_func=lambda g: f"{g}年") if grade_options else []
+            # Classes are keyed by grade (e.g. "1年3組") and offered only for the selected grades
+            class_rows = counts[counts['学年'].isin(selected_grades)] if grade_options else counts
+            class_options = sorted(class_rows['クラス'].dropna().unique())
+            with filter_col2:
+                selected_classes = st.multiselect("クラス", class_options, default=class_options) if class_options else []
+            with filter_col3:
+                selected_questions = st.multiselect("質問項目", question_options, default=question_options)
+
+            # "All selected" means no filter, so rows with an unreadable ID still count (as in the Excel reports)
+            figures = create_dashboard_figures(
+                counts,
+                None if set(selected_grades) == set(grade_options) else selected_grades,
+                None if set(selected_classes) == set(class_options) else selected_classes,
+                None if set(selected_questions) == set(question_options) else selected_questions,
+            )
+            chart_col1, chart_col2 = st.columns(2)
+            with chart_col1:
+                st.plotly_chart(figures['radar'], use_container_width=True)
+            with chart_col2:
+                st.plotly_chart(figures['trend'], use_container_width=True)
+            st.plotly_chart(figures['distribution'], use_container_width=True)
+        except Exception as e:
+            st.warning(f"プレビューを表示できませんでした: {e}")
+
+        st.markdown("---")
         st.header("レポートの一括生成")
         st.write(f"**調査時期:** `{current_survey}`")
         
@@ -62,9 +104,7 @@ else:
             st.header(f"生成されたレポート (`{current_survey}`)")
 
             # --- Dynamically create filenames ---
-            # Extract month like "9月" from "9月(第二回)"
-            month_match = re.match(r'(\d+月)', current_survey)
-            month_str = month_match.group(1) if month_match else "UnknownMonth"
+            filenames = report_filenames(current_survey)
 
             # Create two columns for better layout
             col1, col2 = st.columns(2)
@@ -74,21 +114,21 @@ else:
                 st.download_button(
                     label="【その１】質問項目と表",
                     data=st.session_state['report_one_bytes'],
-                    file_name=f"【その１データ】 RGB意識調査の質問項目と表(職員会議用）.xlsx", # This filename seems static
+                    file_name=filenames["one"],
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     key="btn1"
                 )
                 st.download_button(
                     label="【その２】RGBレーダーチャート",
                     data=st.session_state['radar_chart_bytes'],
-                    file_name=f"【その２データ】RGBレーダーチャート（R7職員会議資料用）.xlsx", # This filename also seems static
+                    file_name=filenames["radar"],
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     key="btn2"
                 )
                 st.download_button(
                     label="【その３】RGB推移グラフ",
                     data=st.session_state['trend_graph_bytes'],
-                    file_name=f"【その３データ】【R3～R7】RGB推移グラフ（R7職員会議用）.xlsx", # This filename also seems static
+                    file_name=filenames["trend"],
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     key="btn3"
                 )
@@ -100,7 +140,7 @@ else:
                     st.download_button(
                         label=f"【{name}】結果（分布あり）",
                         data=report_bytes,
-                        file_name=f"1.RGB意識調査R7.{month_str}結果（{name}・分布あり）.xlsx",
+                        file_name=grade_report_filename(current_survey, name),
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                         key=f"btn_grade_{i}"
                     )
@@ -0,0 +1,95 @@
+import io
+import os
+import sys
+import random
+import zipfile
+
+import pytest
+
+# The application modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import ALL_QUESTIONS, COMPETENCY_MAP, SCORE_MAP
+
+ID_COLUMN = "あなたのクラスと出席番号を4桁の数字で入力してください　例）1年6組34番 ⇒ 1634"
+
+
+def make_survey_xlsx(n_students=120, seed=0):
+    """A raw survey workbook as uploaded by staff."""
+    import pandas as pd
+    random.seed(seed)
+    answers = list(SCORE_MAP)
+    rows = []
+    for _ in range(n_students):
+        row = {ID_COLUMN: f"{random.randint(1, 3)}{random.randint(1, 8)}{random.randint(1, 40):02d}"}
+        for q in ALL_QUESTIONS:
+            row[q] = random.choice(answers)
+        rows.append(row)
+    output = io.BytesIO()
+    pd.DataFrame(rows).to_excel(output, index=False)
+    return output.getvalue()
+
+
+def add_calc_chain(xlsx_bytes, cells):
+    """Adds an xl/calcChain.xml (as Excel writes it) listing `cells`."""
+    calc_chain = ('<calcChain xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                  + ''.join(f'<c r="{ref}" i="1"/>' for ref in cells) + '</calcChain>')
+    output = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(xlsx_bytes)) as zin, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for name in zin.namelist():
+            data = zin.read(name)
+            if name == '[Content_Types].xml':
+                data = data.replace(b'</Types>', b'<Override PartName="/xl/calcChain.xml" ContentType='
+                                    b'"application/vnd.openxmlformats-officedocument.spreadsheetml.calcChain+xml"/></Types>')
+            elif name == 'xl/_rels/workbook.xml.rels':
+                data = data.replace(b'</Relationships>', b'<Relationship Id="rId99" Type="http://schemas.'
+                                    b'openxmlformats.org/officeDocument/2006/relationships/calcChain" '
+                                    b'Target="calcChain.xml"/></Relationships>')
+            zout.writestr(name, data)
+        zout.writestr('xl/calcChain.xml', calc_chain)
+    return output.getvalue()
+
+
+def make_report_one_template():
+    """
+    A small stand-in for the その１ template: shared-string question texts in
+    column C, formatted but empty (missing) value cells, competency labels in
+    AE, a formula column and a calcChain.xml.
+    """
+    import xlsxwriter
+    output = io.BytesIO()
+    wb = xlsxwriter.Workbook(output)
+    wb.add_worksheet('メモ').write(0, 0, 'memo')
+    ws = wb.add_worksheet('意識調査')
+    ws.activate()
+    border_fmt = wb.add_format({'border': 1})
+    fill_fmt = wb.add_format({'border': 1, 'bg_color': '#DDEEFF', 'bold': True})
+    ws.write(0, 2, '質問項目', border_fmt)
+    for i, q in enumerate(ALL_QUESTIONS):
+        row = i + 1
+        ws.write(row, 2, f"{i + 1}. {q}", border_fmt)
+        # Only some value columns carry a format; the others have no cell at all
+        for col in range(3, 28, 2):
+            ws.write_blank(row, col, None, fill_fmt)
+        ws.write_formula(row, 29, f"=AVERAGE(D{row + 1}:F{row + 1})", border_fmt, 0)
+    for i, (_, competency, _) in enumerate(COMPETENCY_MAP):
+        ws.write(2 + i, 30, f"{competency}(平均)")
+        ws.write_blank(2 + i, 31, None, fill_fmt)
+    wb.close()
+    return add_calc_chain(output.getvalue(), [f"AD{row + 2}" for row in range(len(ALL_QUESTIONS))])
+
+
+@pytest.fixture
+def template_dir(tmp_path, monkeypatch):
+    """Runs the test from a directory containing a generated その１ template."""
+    from report_1_generator import TEMPLATE_PATH
+    path = tmp_path / TEMPLATE_PATH
+    path.parent.mkdir(parents=True)
+    path.write_bytes(make_report_one_template())
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def survey_xlsx():
+    return make_survey_xlsx()
@@ -0,0 +1,143 @@
+import io
+import os
+import socket
+import zipfile
+import threading
+import http.client
+import multiprocessing
+from urllib.parse import quote
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("openpyxl")
+pytest.importorskip("xlsxwriter")
+
+from api_server import ReportHTTPServer, request_report, XLSX_MIME, ZIP_MIME
+from config import report_filenames, grade_report_filename
+
+SURVEY_PERIOD = "9月(第二回)"
+
+
+@pytest.fixture
+def server(template_dir):
+    srv = ReportHTTPServer(("127.0.0.1", 0), workers=1, queue_size=0, job_timeout=60)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def connect(srv):
+    return http.client.HTTPConnection(*srv.server_address, timeout=60)
+
+
+def raw_post(srv, headers, body=b""):
+    """Sends a hand-written POST and returns the status line of the response."""
+    with socket.create_connection(srv.server_address, timeout=60) as sock:
+        request = f"POST /reports/trend?survey_period={quote(SURVEY_PERIOD)} HTTP/1.1\r\nHost: x\r\n"
+        sock.sendall((request + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n").encode() + body)
+        return sock.recv(4096).split(b"\r\n")[0].decode()
+
+
+@pytest.mark.parametrize("kind", ["one", "radar", "trend"])
+def test_single_reports(server, survey_xlsx, kind):
+    status, headers, body = request_report(connect(server), kind, survey_xlsx, SURVEY_PERIOD)
+    assert status == 200
+    assert headers["Content-Type"] == XLSX_MIME
+    assert quote(report_filenames(SURVEY_PERIOD)[kind]) in headers["Content-Disposition"]
+    assert zipfile.is_zipfile(io.BytesIO(body))
+
+
+def test_bundle_contains_every_report(server, survey_xlsx):
+    status, headers, body = request_report(connect(server), "bundle", survey_xlsx, SURVEY_PERIOD)
+    assert status == 200
+    assert headers["Content-Type"] == ZIP_MIME
+    names = report_filenames(SURVEY_PERIOD)
+    expected = {names["one"], names["radar"], names["trend"]}
+    expected |= {grade_report_filename(SURVEY_PERIOD, g) for g in ["1年", "2年", "3年", "全体"]}
+    assert set(zipfile.ZipFile(io.BytesIO(body)).namelist()) == expected
+
+
+def test_grades_zip(server, survey_xlsx):
+    status, headers, body = request_report(connect(server), "grades", survey_xlsx, SURVEY_PERIOD)
+    assert status == 200
+    assert headers["Content-Type"] == ZIP_MIME
+    assert len(zipfile.ZipFile(io.BytesIO(body)).namelist()) == 4
+
+
+def test_keep_alive_reuses_connection(server, survey_xlsx):
+    conn = connect(server)
+    assert request_report(conn, "trend", survey_xlsx, SURVEY_PERIOD)[0] == 200
+    sock = conn.sock
+    assert request_report(conn, "radar", survey_xlsx, SURVEY_PERIOD)[0] == 200
+    assert conn.sock is sock
+
+
+def test_invalid_requests(server, survey_xlsx):
+    conn = connect(server)
+    assert request_report(conn, "trend", survey_xlsx, "2月(第四回)")[0] == 400
+    assert request_report(conn, "unknown", survey_xlsx, SURVEY_PERIOD)[0] == 404
+    # The connection stays usable after a rejected request
+    assert request_report(conn, "trend", survey_xlsx, SURVEY_PERIOD)[0] == 200
+
+
+def test_unreadable_upload_is_a_client_error(server):
+    status, _, _ = request_report(connect(server), "trend", b"garbage", SURVEY_PERIOD)
+    assert status == 422
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_malformed_content_length(server, length):
+    assert raw_post(server, {"Content-Length": length}) == "HTTP/1.1 400 Bad Request"
+
+
+def test_busy_server_answers_503_after_large_upload(server):
+    # Hold the only slot, as a running job would
+    assert server.slots.acquire(blocking=False)
+    try:
+        status, headers, _ = request_report(connect(server), "trend", b"x" * (8 * 1024 * 1024), SURVEY_PERIOD)
+        assert status == 503
+        assert headers["Retry-After"] == "1"
+    finally:
+        server.slots.release()
+
+
+def test_oversized_upload_gets_413(server):
+    status, _, _ = request_report(connect(server), "trend", b"x" * (21 * 1024 * 1024), SURVEY_PERIOD)
+    assert status == 413
+
+
+def test_expect_100_rejects_before_body(server):
+    assert server.slots.acquire(blocking=False)
+    try:
+        assert raw_post(server, {"Content-Length": 1000, "Expect": "100-continue"}) == \
+            "HTTP/1.1 503 Service Unavailable"
+    finally:
+        server.slots.release()
+    assert raw_post(server, {"Content-Length": 1000, "Expect": "100-continue"}) == "HTTP/1.1 100 Continue"
+
+
+def test_worker_crash_frees_slot(server, survey_xlsx):
+    # Kill the only worker while a report job is queued behind it
+    crash = server.executor.submit(os._exit, 1)
+    assert server.slots.acquire(blocking=False)
+    future = server.submit_job("trend", survey_xlsx, SURVEY_PERIOD)
+    with pytest.raises(Exception):
+        crash.result(timeout=60)
+    try:
+        future.result(timeout=60)
+    except Exception:
+        pass
+    # The slot came back and the pool was replaced
+    assert server.slots.acquire(blocking=False)
+    server.slots.release()
+    assert request_report(connect(server), "trend", survey_xlsx, SURVEY_PERIOD)[0] == 200
+
+
+def test_bind_failure_stops_workers(server):
+    workers_before = len(multiprocessing.active_children())
+    with pytest.raises(OSError):
+        ReportHTTPServer(server.server_address, workers=1, queue_size=0, job_timeout=60)
+    assert len(multiprocessing.active_children()) == workers_before
@@ -0,0 +1,108 @@
+import io
+import re
+import zipfile
+
+import pytest
+
+pytest.importorskip("pandas")
+openpyxl = pytest.importorskip("openpyxl")
+pytest.importorskip("xlsxwriter")
+
+import pandas as pd
+
+from conftest import make_report_one_template
+from data_processor import preprocess_data
+from report_1_generator import generate_report_one
+from xlsx_patcher import parse_template, patch_workbook
+
+SURVEY_PERIOD = "9月(第二回)"
+
+
+def style_of(cell):
+    """Comparable style attributes (openpyxl style proxies differ across workbooks)."""
+    return (cell.font.b, cell.font.name, cell.border.left.style, cell.border.bottom.style,
+            cell.fill.patternType, cell.fill.fgColor.rgb, cell.number_format)
+
+
+def sheet_cells(xlsx):
+    ws = openpyxl.load_workbook(xlsx).active
+    return {cell.coordinate: (cell.value, style_of(cell)) for row in ws.iter_rows() for cell in row}
+
+
+def assert_same_cells(actual, expected):
+    assert actual.keys() == expected.keys()
+    for ref, (value, style) in expected.items():
+        if isinstance(value, float):
+            assert actual[ref][0] == pytest.approx(value), ref
+        else:
+            assert actual[ref][0] == value, ref
+        assert actual[ref][1] == style, ref
+
+
+def replace_entry(xlsx_bytes, name, transform):
+    output = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(xlsx_bytes)) as zin, zipfile.ZipFile(output, 'w') as zout:
+        for info in zin.infolist():
+            data = zin.read(info)
+            zout.writestr(info, transform(data.decode('utf-8')).encode('utf-8') if info.filename == name else data)
+    return output.getvalue()
+
+
+def test_engines_produce_the_same_workbook(template_dir, survey_xlsx):
+    df_processed = preprocess_data(pd.read_excel(io.BytesIO(survey_xlsx)))
+    xml_output = generate_report_one(df_processed, SURVEY_PERIOD, engine='xml')
+    openpyxl_output = generate_report_one(df_processed, SURVEY_PERIOD, engine='openpyxl')
+
+    xml_cells = sheet_cells(xml_output)
+    assert_same_cells(xml_cells, sheet_cells(openpyxl_output))
+    # Shared-string texts survive and values went into cells missing from the template
+    assert xml_cells["C2"][0].startswith("1. ")
+    assert isinstance(xml_cells["M2"][0], float)
+    assert xml_cells["M2"][1][-1] == "0.0"
+
+    with zipfile.ZipFile(xml_output) as zf:
+        assert "xl/calcChain.xml" not in zf.namelist()
+        assert b"calcChain" not in zf.read("[Content_Types].xml")
+        assert b"calcChain" not in zf.read("xl/_rels/workbook.xml.rels")
+        assert b'fullCalcOnLoad="1"' in zf.read("xl/workbook.xml")
+
+
+def test_missing_rows_and_cells_match_openpyxl():
+    template_bytes = make_report_one_template()
+    # A missing cell in an existing row, a new column and a row beyond the sheet
+    values = {(2, 5): 1.25, (3, 40): 2.5, (60, 4): 3.75, (58, 2): 0.5}
+    xml_output = patch_workbook(parse_template(template_bytes), values)
+
+    wb = openpyxl.load_workbook(io.BytesIO(template_bytes))
+    for (row, col), value in values.items():
+        wb.active.cell(row=row, column=col).value = value
+        wb.active.cell(row=row, column=col).number_format = '0.0'
+    openpyxl_output = io.BytesIO()
+    wb.save(openpyxl_output)
+
+    assert_same_cells(sheet_cells(xml_output), sheet_cells(openpyxl_output))
+
+
+def test_overwritten_shared_formula_master_is_expanded():
+    template_bytes = make_report_one_template()
+    sheet_path = parse_template(template_bytes).sheet_path
+
+    def share_formula(sheet_xml):
+        # AD2 becomes the master of a formula shared by AD2:AD4, as Excel writes filled-down formulas
+        sheet_xml = re.sub(r'(<c r="AD2"[^>]*>)<f>[^<]*</f>',
+                           r'\1<f t="shared" ref="AD2:AD4" si="0">IF(D2&lt;3,D2,E2)</f>', sheet_xml)
+        return re.sub(r'(<c r="AD[34]"[^>]*>)<f>[^<]*</f>', r'\1<f t="shared" si="0"/>', sheet_xml)
+
+    template_bytes = replace_entry(template_bytes, sheet_path, share_formula)
+    output = patch_workbook(parse_template(template_bytes), {(2, 30): 1.5})
+
+    with zipfile.ZipFile(output) as zf:
+        sheet_xml = zf.read(sheet_path).decode('utf-8')
+    assert 'si="0"' not in sheet_xml
+    assert '<f>IF(D3&lt;3,D3,E3)</f>' in sheet_xml
+
+    ws = openpyxl.load_workbook(output).active
+    assert ws["AD2"].value == 1.5
+    assert ws["AD3"].value == "=IF(D3<3,D3,E3)"
+    assert ws["AD4"].value == "=IF(D4<3,D4,E4)"
+    assert ws["AD5"].value == "=AVERAGE(D5:F5)"
@@ -0,0 +1,319 @@
+import io
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from xml.sax.saxutils import escape, unescape
+from openpyxl.formula.translate import Translator
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+# Writes cell values into an existing xlsx by rewriting only the XML of the
+# target sheet (plus the small styles/workbook parts it depends on). Every
+# other zip entry is copied through unchanged, so the formatting of the
+# template is preserved without loading it into openpyxl's object model.
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_DOC_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+REL_OFFICE_DOCUMENT = NS_DOC_REL + '/officeDocument'
+REL_SHARED_STRINGS = NS_DOC_REL + '/sharedStrings'
+REL_STYLES = NS_DOC_REL + '/styles'
+CALC_CHAIN = 'xl/calcChain.xml'
+
+# Elements that must follow <calcPr> inside <workbook> (ECMA-376 order)
+_AFTER_CALC_PR = ['oleSize', 'customWorkbookViews', 'pivotCaches', 'smartTagPr', 'smartTagTypes',
+                  'webPublishing', 'fileRecoveryPr', 'webPublishObjects', 'extLst']
+
+XlsxTemplate = namedtuple('XlsxTemplate', ['entries', 'workbook_path', 'sheet_path', 'styles_path',
+                                           'cells', 'max_row'])
+
+
+# --- Reading ---
+def _q(tag, ns=NS_MAIN):
+    return f'{{{ns}}}{tag}'
+
+
+def _read_rels(entries, part_path):
+    """Returns {Id: (Type, absolute target path)} for a part's relationships."""
+    base, name = posixpath.split(part_path)
+    rels_path = posixpath.join(base, '_rels', name + '.rels')
+    if rels_path not in entries:
+        return {}
+    rels = {}
+    for rel in ET.fromstring(entries[rels_path]).iter(_q('Relationship', NS_PKG_REL)):
+        target = rel.get('Target')
+        target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(base, target))
+        rels[rel.get('Id')] = (rel.get('Type'), target)
+    return rels
+
+
+def _string_item_text(si):
+    # Skip phonetic runs (<rPh>), which would otherwise add furigana to the text
+    texts = [si.find(_q('t'))] + [r.find(_q('t')) for r in si.findall(_q('r'))]
+    return ''.join(t.text or '' for t in texts if t is not None)
+
+
+def parse_template(template_bytes, sheet_name=None):
+    """
+    Parses the parts of an xlsx needed to locate and patch cells.
+    Uses the workbook's active sheet unless `sheet_name` is given.
+    """
+    with zipfile.ZipFile(io.BytesIO(template_bytes)) as zf:
+        infos = zf.infolist()
+        entries = {info.filename: zf.read(info) for info in infos}
+
+    root_rels = _read_rels(entries, '')
+    workbook_path = next(t for typ, t in root_rels.values() if typ == REL_OFFICE_DOCUMENT)
+    workbook_rels = _read_rels(entries, workbook_path)
+    workbook = ET.fromstring(entries[workbook_path])
+
+    sheets = workbook.find(_q('sheets')).findall(_q('sheet'))
+    if sheet_name is None:
+        view = workbook.find(f"{_q('bookViews')}/{_q('workbookView')}")
+        sheet = sheets[int(view.get('activeTab', 0)) if view is not None else 0]
+    else:
+        sheet = next(s for s in sheets if s.get('name') == sheet_name)
+    sheet_path = workbook_rels[sheet.get(_q('id', NS_DOC_REL))][1]
+    styles_path = next(t for typ, t in workbook_rels.values() if typ == REL_STYLES)
+
+    shared_strings = []
+    sst_path = next((t for typ, t in workbook_rels.values() if typ == REL_SHARED_STRINGS), None)
+    if sst_path:
+        shared_strings = [_string_item_text(si) for si in ET.fromstring(entries[sst_path]).findall(_q('si'))]
+
+    cells = {}
+    max_row = 0
+    for row in ET.fromstring(entries[sheet_path]).iter(_q('row')):
+        max_row = max(max_row, int(row.get('r')))
+        for c in row.findall(_q('c')):
+            v = c.find(_q('v'))
+            text = v.text if v is not None else None
+            cell_type = c.get('t', 'n')
+            if cell_type == 'inlineStr':
+                cells[c.get('r')] = _string_item_text(c.find(_q('is')))
+            elif not text:
+                continue
+            elif cell_type == 's':
+                cells[c.get('r')] = shared_strings[int(text)]
+            elif cell_type == 'n':
+                cells[c.get('r')] = float(text)
+            else:
+                cells[c.get('r')] = text
+
+    return XlsxTemplate([(info, entries[info.filename]) for info in infos],
+                        workbook_path, sheet_path, styles_path, cells, max_row)
+
+
+# --- Patching helpers (string level, so untouched markup stays byte-identical) ---
+def _attr(attrs, name):
+    match = re.search(rf'(?<![\w:]){name}="([^"]*)"', attrs)
+    return match.group(1) if match else None
+
+
+def _set_attr(attrs, name, value):
+    if _attr(attrs, name) is None:
+        return f'{attrs} {name}="{value}"'
+    return re.sub(rf'(?<![\w:]){name}="[^"]*"', f'{name}="{value}"', attrs)
+
+
+def _drop_attr(attrs, name):
+    return re.sub(rf'\s+{name}="[^"]*"', '', attrs)
+
+
+def _add_number_format(styles_xml, format_code):
+    """Returns (styles_xml, numFmtId) with a custom number format registered."""
+    block = re.search(r'<numFmts\b[^>]*?(?:/>|>(.*?)</numFmts>)', styles_xml, re.S)
+    existing = re.findall(r'<numFmt\b[^>]*/>', block.group(1) or '') if block else []
+    for fmt in existing:
+        if _attr(fmt, 'formatCode') == format_code:
+            return styles_xml, int(_attr(fmt, 'numFmtId'))
+
+    num_fmt_id = max([163] + [int(_attr(fmt, 'numFmtId')) for fmt in existing]) + 1
+    new_fmt = f'<numFmt numFmtId="{num_fmt_id}" formatCode="{format_code}"/>'
+    if block:
+        new_block = f'<numFmts count="{len(existing) + 1}">{"".join(existing)}{new_fmt}</numFmts>'
+        styles_xml = styles_xml[:block.start()] + new_block + styles_xml[block.end():]
+    else:
+        # <numFmts> must be the first child of <styleSheet>
+        head = re.search(r'<styleSheet\b[^>]*>', styles_xml)
+        styles_xml = styles_xml[:head.end()] + f'<numFmts count="1">{new_fmt}</numFmts>' + styles_xml[head.end():]
+    return styles_xml, num_fmt_id
+
+
+def _number_format_styles(styles_xml, style_ids, format_code):
+    """
+    For each existing cellXfs index in `style_ids`, adds a copy that differs
+    only in its number format (as openpyxl does when number_format is set).
+    Returns (styles_xml, {old index: new index}).
+    """
+    styles_xml, num_fmt_id = _add_number_format(styles_xml, format_code)
+    block = re.search(r'<cellXfs\b[^>]*>(.*?)</cellXfs>', styles_xml, re.S)
+    xfs = re.findall(r'<xf\b[^>]*?(?:/>|>.*?</xf>)', block.group(1), re.S)
+
+    mapping = {}
+    new_xfs = []
+    for style_id in sorted(style_ids):
+        xf = xfs[style_id]
+        open_tag = re.match(r'<xf\b([^>]*?)(/?)>', xf)
+        attrs = open_tag.group(1)
+        if _attr(attrs, 'numFmtId') == str(num_fmt_id):
+            mapping[style_id] = style_id
+            continue
+        attrs = _set_attr(_set_attr(attrs, 'numFmtId', num_fmt_id), 'applyNumberFormat', '1')
+        new_xfs.append(f'<xf{attrs}{open_tag.group(2)}>' + xf[open_tag.end():])
+        mapping[style_id] = len(xfs) + len(new_xfs) - 1
+
+    new_block = f'<cellXfs count="{len(xfs) + len(new_xfs)}">{block.group(1)}{"".join(new_xfs)}</cellXfs>'
+    return styles_xml[:block.start()] + new_block + styles_xml[block.end():], mapping
+
+
+def _patch_sheet(sheet_xml, values, format_code, styles_xml):
+    """Writes `values` ({(row, col): number}) into the sheet XML."""
+    prefix = re.search(r'<(\w+:)?worksheet\b', sheet_xml).group(1) or ''
+    p = re.escape(prefix)
+    row_re = re.compile(rf'<{p}row\b([^>]*?)(?:/>|>(.*?)</{p}row>)', re.S)
+    cell_re = re.compile(rf'<{p}c\b([^>]*?)(?:/>|>(.*?)</{p}c>)', re.S)
+
+    by_row = {}
+    for (row, col), value in values.items():
+        by_row.setdefault(row, {})[f'{get_column_letter(col)}{row}'] = value
+
+    formula_re = re.compile(rf'<{p}f\b([^>]*?)(?:/>|>(.*?)</{p}f>)', re.S)
+
+    # First pass: existing styles of every target cell
+    existing = {}
+    for row_match in row_re.finditer(sheet_xml):
+        for cell_match in cell_re.finditer(row_match.group(2) or ''):
+            existing[_attr(cell_match.group(1), 'r')] = (cell_match.group(1), cell_match.group(2) or '')
+    style_of = {ref: int(_attr(existing.get(ref, ('', ''))[0], 's') or 0) for refs in by_row.values() for ref in refs}
+
+    # Shared formulas whose master cell is overwritten: {si: (master ref, formula)}
+    orphaned = {}
+    for refs in by_row.values():
+        for ref in refs:
+            formula = formula_re.search(existing.get(ref, ('', ''))[1])
+            if formula and _attr(formula.group(1), 't') == 'shared' and _attr(formula.group(1), 'ref'):
+                orphaned[_attr(formula.group(1), 'si')] = (ref, unescape(formula.group(2) or ''))
+    styles_xml, style_map = _number_format_styles(styles_xml, set(style_of.values()), format_code)
+
+    def render_cell(ref, attrs, value):
+        for name in ('t', 's', 'cm', 'vm'):
+            attrs = _drop_attr(attrs, name)
+        return f'<{prefix}c{attrs} s="{style_map[style_of[ref]]}"><{prefix}v>{float(value)!r}</{prefix}v></{prefix}c>'
+
+    def render_row(row_num, attrs, content):
+        targets = by_row[row_num]
+        cells = [(m.group(0), _attr(m.group(1), 'r'), m.group(1)) for m in cell_re.finditer(content)]
+        written = {ref for _, ref, _ in cells if ref in targets}
+        cells = [(render_cell(ref, a, targets[ref]) if ref in targets else xml, ref, a) for xml, ref, a in cells]
+        for ref in targets.keys() - written:
+            col = column_index_from_string(re.match(r'[A-Z]+', ref).group(0))
+            pos = next((i for i, (_, r, _) in enumerate(cells)
+                        if column_index_from_string(re.match(r'[A-Z]+', r).group(0)) > col), len(cells))
+            cells.insert(pos, (render_cell(ref, f' r="{ref}"', targets[ref]), ref, None))
+        # spans is only a load hint and may no longer be accurate
+        attrs = _drop_attr(attrs, 'spans')
+        return f'<{prefix}row{attrs}>' + ''.join(xml for xml, _, _ in cells) + f'</{prefix}row>'
+
+    pending = set(by_row)
+    pieces = []
+    last = 0
+    for row_match in row_re.finditer(sheet_xml):
+        row_num = int(_attr(row_match.group(1), 'r'))
+        # Rows missing from the template are inserted in order
+        for missing in sorted(r for r in pending if r < row_num):
+            pieces.append(sheet_xml[last:row_match.start()] + render_row(missing, f' r="{missing}"', ''))
+            last = row_match.start()
+            pending.discard(missing)
+        if row_num in pending:
+            pieces.append(sheet_xml[last:row_match.start()]
+                          + render_row(row_num, row_match.group(1), row_match.group(2) or ''))
+            last = row_match.end()
+            pending.discard(row_num)
+    tail = sheet_xml[last:]
+    if pending:
+        new_rows = ''.join(render_row(r, f' r="{r}"', '') for r in sorted(pending))
+        if re.search(rf'<{p}sheetData\s*/>', tail):
+            tail = re.sub(rf'<{p}sheetData\s*/>', f'<{prefix}sheetData>{new_rows}</{prefix}sheetData>', tail, count=1)
+        else:
+            tail = re.sub(rf'</{p}sheetData>', lambda m: new_rows + m.group(0), tail, count=1)
+    pieces.append(tail)
+    sheet_xml = ''.join(pieces)
+    if orphaned:
+        sheet_xml = _expand_shared_formulas(sheet_xml, orphaned, cell_re, formula_re, prefix)
+    return sheet_xml, styles_xml
+
+
+def _expand_shared_formulas(sheet_xml, orphaned, cell_re, formula_re, prefix):
+    """
+    Gives every cell that shared a now-overwritten master formula its own
+    formula, translated to the cell's position (as openpyxl does on load).
+    Dependents left without a master make Excel repair the file.
+    """
+    def expand_formula(cell_ref, formula_match):
+        attrs = formula_match.group(1)
+        si = _attr(attrs, 'si')
+        if _attr(attrs, 't') != 'shared' or _attr(attrs, 'ref') or si not in orphaned:
+            return formula_match.group(0)
+        master_ref, formula = orphaned[si]
+        translated = Translator(f'={formula}', origin=master_ref).translate_formula(cell_ref)[1:]
+        return f'<{prefix}f>{escape(translated)}</{prefix}f>'
+
+    def expand_cell(cell_match):
+        if not cell_match.group(2):
+            return cell_match.group(0)
+        cell_ref = _attr(cell_match.group(1), 'r')
+        content = formula_re.sub(lambda m: expand_formula(cell_ref, m), cell_match.group(2))
+        return cell_match.group(0)[:cell_match.start(2) - cell_match.start()] + content + \
+            cell_match.group(0)[cell_match.end(2) - cell_match.start():]
+
+    return cell_re.sub(expand_cell, sheet_xml)
+
+
+def _force_full_calc(workbook_xml):
+    """Cached formula results in the template are stale once inputs change."""
+    # Only the opening tag is rewritten, so <calcPr> with child elements keeps them
+    calc_pr = re.search(r'<calcPr\b([^>]*?)(/?)>', workbook_xml)
+    if calc_pr:
+        new_tag = f'<calcPr{_set_attr(calc_pr.group(1), "fullCalcOnLoad", "1")}{calc_pr.group(2)}>'
+        return workbook_xml[:calc_pr.start()] + new_tag + workbook_xml[calc_pr.end():]
+    following = [m for tag in _AFTER_CALC_PR for m in [re.search(rf'<{tag}\b', workbook_xml)] if m]
+    pos = min(m.start() for m in following) if following else workbook_xml.rindex('</workbook>')
+    return workbook_xml[:pos] + '<calcPr fullCalcOnLoad="1"/>' + workbook_xml[pos:]
+
+
+def patch_workbook(template, values, number_format='0.0'):
+    """
+    Returns an in-memory xlsx equal to `template` with `values`
+    ({(row, col): number}) written to its sheet using `number_format`.
+    """
+    replaced = {}
+    if values:
+        entries = {info.filename: data for info, data in template.entries}
+        sheet_xml, styles_xml = _patch_sheet(entries[template.sheet_path].decode('utf-8'), values,
+                                             number_format, entries[template.styles_path].decode('utf-8'))
+        replaced[template.sheet_path] = sheet_xml.encode('utf-8')
+        replaced[template.styles_path] = styles_xml.encode('utf-8')
+
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w') as zout:
+        for info, data in template.entries:
+            name = info.filename
+            if name == CALC_CHAIN:
+                # Excel rebuilds the calculation chain; a stale one triggers repair
+                continue
+            if name == template.workbook_path:
+                data = _force_full_calc(data.decode('utf-8')).encode('utf-8')
+            elif name == '[Content_Types].xml':
+                data = re.sub(rb'<Override\b[^>]*PartName="/xl/calcChain\.xml"[^>]*/>', b'', data)
+            elif name.endswith('.rels'):
+                data = re.sub(rb'<Relationship\b[^>]*Target="[^"]*calcChain\.xml"[^>]*/>', b'', data)
+            data = replaced.get(name, data)
+            # Fresh ZipInfo: the cached template's entries must not be mutated
+            out_info = zipfile.ZipInfo(name, info.date_time)
+            out_info.compress_type = info.compress_type
+            out_info.external_attr = info.external_attr
+            zout.writestr(out_info, data)
+    output.seek(0)
+    return output